@@ -1,14 +1,75 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware  # Import CORS middleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from engine.search_engine import SearchEngine
+from engine.query_log import QueryLog
+from engine.warmer import CacheWarmer
+from engine.profiler import StackSampler, Profile, SlowestProfiles
+from engine.response_formats import (
+    negotiate, project, unknown_fields, to_columnar_json, to_arrow_ipc, pa,
+    ROWS_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE, ARROW_MEDIA_TYPE, SUPPORTED_MEDIA_TYPES, COLUMNAR_COLUMNS,
+)
+from nba_api.stats.library.http import NBAStatsHTTP
+import hmac
+import os
 import random
+import re
+import time
 
-# Create the FastAPI app
-app = FastAPI()
+# Point nba_api at another stats host, e.g. the local stand-in used for load testing
+if os.environ.get("BALLHARBOR_STATS_BASE_URL"):
+    NBAStatsHTTP.base_url = os.environ["BALLHARBOR_STATS_BASE_URL"]
 
 # Initialize your search engine
-search_engine = SearchEngine()
+search_engine = SearchEngine(
+    cache_ttl=int(os.environ.get("BALLHARBOR_CACHE_TTL", 6 * 60 * 60)),
+    cache_path=os.environ.get("BALLHARBOR_CACHE_PATH"),
+)
+
+# Every /query is recorded here; the warmer re-fetches the most popular plans from it
+query_log = QueryLog(
+    os.environ.get("BALLHARBOR_QUERY_LOG", "query_log.jsonl"),
+    max_bytes=int(os.environ.get("BALLHARBOR_QUERY_LOG_MAX_BYTES", 16 * 1024 * 1024)),
+)
+cache_warmer = CacheWarmer(
+    search_engine,
+    query_log,
+    top_n=int(os.environ.get("BALLHARBOR_WARM_TOP_N", 25)),
+    max_workers=int(os.environ.get("BALLHARBOR_WARM_CONCURRENCY", 2)),
+    rate=float(os.environ.get("BALLHARBOR_WARM_RATE", 1.0)),
+    nightly_hour=int(os.environ.get("BALLHARBOR_WARM_NIGHTLY_HOUR", 4)),
+)
+
+# Profiling: opt-in per request (gated by BALLHARBOR_PROFILE_TOKEN) plus an always-on low rate
+# sampler that keeps the profiles of the slowest requests
+PROFILE_TOKEN = os.environ.get("BALLHARBOR_PROFILE_TOKEN")
+PROFILE_DIR = os.environ.get("BALLHARBOR_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.environ.get("BALLHARBOR_PROFILE_INTERVAL_MS", 1)) / 1000
+slow_sampler = StackSampler(interval=float(os.environ.get("BALLHARBOR_SLOW_SAMPLER_INTERVAL_MS", 10)) / 1000)
+slowest_profiles = SlowestProfiles(
+    size=int(os.environ.get("BALLHARBOR_SLOWEST_PROFILES", 20)),
+    window=int(os.environ.get("BALLHARBOR_SLOWEST_PROFILES_WINDOW_S", 60 * 60)),
+)
+
+def check_profile_token(token):
+    if not PROFILE_TOKEN or not token or not hmac.compare_digest(token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Profile-Token header")
+
+@asynccontextmanager
+async def lifespan(app):
+    if os.environ.get("BALLHARBOR_WARM_CACHE", "1") == "1":
+        cache_warmer.start()
+    if os.environ.get("BALLHARBOR_SLOW_SAMPLER", "1") == "1":
+        slow_sampler.start()
+    yield
+    cache_warmer.stop()
+    slow_sampler.stop()
+
+# Create the FastAPI app
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for local frontend development
 app.add_middleware(
@@ -23,6 +84,8 @@ app.add_middleware(
 # Define a request body schema using Pydantic
 class QueryRequest(BaseModel):
     query: str
+    profile: bool = False  # Run under the sampling profiler (requires X-Profile-Token)
+    fields: Optional[List[str]] = None  # Columns to return; all for row JSON, non-derived ones for columnar formats
 
 # Root endpoint
 @app.get("/")
@@ -31,22 +94,95 @@ def read_root():
 
 # Endpoint to handle queries
 @app.post("/query")
-def get_results(request: QueryRequest):
+def get_results(request: QueryRequest, response: Response, accept: Optional[str] = Header(None), x_profile_token: Optional[str] = Header(None)):
+    if request.profile:
+        check_profile_token(x_profile_token)
+
+    # Content negotiation: row JSON by default, columnar JSON or an Arrow IPC stream on request
+    response.headers["Vary"] = "Accept"
+    media_type = negotiate(accept)
+    if media_type is None:
+        available = [media for media in SUPPORTED_MEDIA_TYPES if media != ARROW_MEDIA_TYPE or pa is not None]
+        raise HTTPException(status_code=406, detail=f"Supported media types: {available}")
+    invalid_fields = unknown_fields(request.fields)
+    if invalid_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {invalid_fields}")
+
+    # Profiled requests get their own high rate sampler, everything else goes through the slow sampler
+    sampler = StackSampler(interval=PROFILE_INTERVAL).start() if request.profile else slow_sampler
     try:
-        # Run the search engine's query function
-        results = search_engine.query(request.query)
-
-        # Check if results is not None and has the expected attributes
-        if results is None or results.empty:
-            return {"query": request.query, "data": []}
-
-        # Convert the entire DataFrame to a list of dictionaries
-        data = results.to_dict(orient='records')
-        return {"query": request.query, "data": data}
+        start = time.perf_counter()
+        sampler.begin()
+        try:
+            # Run the search engine's query function
+            results, plans = search_engine.query_with_plans(request.query)
+            result_size = 0 if results is None else len(results)
+
+            if media_type == ARROW_MEDIA_TYPE:
+                body = to_arrow_ipc(request.query, project(results, request.fields, COLUMNAR_COLUMNS))
+            elif media_type == COLUMNAR_JSON_MEDIA_TYPE:
+                # Encoded once the profile is known, like row JSON, so it can carry the profile
+                columnar = project(results, request.fields, COLUMNAR_COLUMNS)
+            # Check if results is not None and has the expected attributes
+            elif results is None or results.empty:
+                data = []
+            else:
+                # Convert the entire DataFrame to a list of dictionaries
+                data = project(results, request.fields).to_dict(orient='records')
+        finally:
+            stacks = sampler.end()
+            if request.profile:
+                sampler.stop()
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        query_log.record(request.query, plans, latency_ms, result_size)
+
+        profile = None
+        if sampler.running or request.profile:
+            profile = Profile(request.query, latency_ms, sampler.interval, stacks)
+            slowest_profiles.add(profile)
+            if request.profile:
+                profile.save(PROFILE_DIR)
+
+        if media_type == COLUMNAR_JSON_MEDIA_TYPE:
+            body = to_columnar_json(request.query, columnar, extra={"profile": profile.to_dict()} if request.profile else None)
+        if media_type != ROWS_MEDIA_TYPE:
+            # Arrow bodies carry the profile id only; fetch it from /profiles/{id}/folded
+            headers = {"Vary": "Accept"}
+            if request.profile:
+                headers["X-Profile-Id"] = profile.id
+            return Response(content=body, media_type=media_type, headers=headers)
+
+        body = {"query": request.query, "data": data}
+        if request.profile:
+            body["profile"] = profile.to_dict()
+        return body
     except Exception as e:
         # Catch and log any unexpected errors
         return {"error": f"An error occurred: {str(e)}"}
 
+# Profiles of the slowest recent requests seen by this worker
+@app.get("/profiles/slowest")
+def get_slowest_profiles(x_profile_token: Optional[str] = Header(None)):
+    check_profile_token(x_profile_token)
+    return {"profiles": [profile.to_dict(include_folded=False) for profile in slowest_profiles.list()]}
+
+# Folded stacks of one profile, ready for flamegraph.pl or speedscope
+@app.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_folded(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    check_profile_token(x_profile_token)
+    profile = slowest_profiles.get(profile_id)
+    if profile is not None:
+        return profile.folded()
+    # Explicitly profiled requests are also on disk, whichever worker served them
+    if not re.fullmatch(r"[0-9a-f]+", profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
 # Endpoint to handle random example query (just as a test)
 @app.get("/random")
 def random_query():
@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def plan_key(params):
+    """
+    Normalize a set of upstream request parameters into a hashable key.
+
+    Parameters:
+        params (dict): Parameters passed to `VideoDetailsAsset`.
+
+    Returns:
+        str: Canonical JSON encoding of the parameters.
+    """
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache whose entries expire `ttl` seconds after they were stored.
+    When full, the entry closest to expiry is evicted. A `ttl` of 0 or less disables caching.
+    """
+    def __init__(self, ttl=6 * 60 * 60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return  # Caching is disabled
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.time() + self.ttl, value)
+
+    def expiring_within(self, seconds):
+        """ Keys that are still valid but expire in the next `seconds` seconds """
+        now = time.time()
+        with self._lock:
+            return [key for key, (expires_at, _) in self._entries.items() if now < expires_at <= now + seconds]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SqliteTTLCache:
+    """
+    TTLCache with the same interface, stored in a local SQLite file so that several worker
+    processes on one box share a single cache. Values must be JSON serializable.
+    """
+    def __init__(self, path, ttl=6 * 60 * 60, max_entries=1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _connection(self):
+        # Connections cannot cross threads or survive a fork, so keep one per thread per process
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn.execute("PRAGMA journal_mode=WAL")
+            self._local.pid = pid
+        return self._local.conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return  # Caching is disabled; skip the write entirely
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, json.dumps(value)),
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def expiring_within(self, seconds):
+        """ Keys that are still valid but expire in the next `seconds` seconds """
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT key FROM cache WHERE expires_at > ? AND expires_at <= ?", (now, now + seconds)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cache WHERE expires_at > ?", (time.time(),)).fetchone()[0]
@@ -0,0 +1,165 @@
+import re
+import numpy as np
+
+
+class Predicate:
+    """
+    A boolean condition over the columns of a processed plays DataFrame.
+
+    Predicates are evaluated straight against the underlying NumPy arrays and can be
+    combined with `&`, `|` and `~`. Nothing is copied until `apply_predicate` selects
+    the matching rows at the very end.
+    """
+    def __init__(self, fn, name):
+        self.fn = fn
+        self.name = name
+
+    def __call__(self, df):
+        return np.asarray(self.fn(df), dtype=bool)
+
+    def __and__(self, other):
+        if self is ALL:
+            return other
+        return Predicate(lambda df: self(df) & other(df), f"({self.name} & {other.name})")
+
+    def __or__(self, other):
+        return Predicate(lambda df: self(df) | other(df), f"({self.name} | {other.name})")
+
+    def __invert__(self):
+        return Predicate(lambda df: ~self(df), f"~{self.name}")
+
+    def __repr__(self):
+        return f"Predicate({self.name})"
+
+
+ALL = Predicate(lambda df: np.ones(len(df), dtype=bool), "all")
+
+
+def _column(df, name):
+    return df[name].to_numpy()
+
+
+def _signed_diffs(df):
+    before = _column(df, 'Home_Points_Before') - _column(df, 'Visitor_Points_Before')
+    after = _column(df, 'Home_Points_After') - _column(df, 'Visitor_Points_After')
+    return before, after
+
+
+def description_contains(keywords):
+    """ Every keyword must appear as a whole word in the play description (case-insensitive) """
+    patterns = [re.compile(rf'\b{re.escape(keyword)}\b', re.IGNORECASE) for keyword in keywords]
+
+    def fn(df):
+        descriptions = df['Description'].fillna('').astype(str).tolist()
+        return np.fromiter(
+            (all(pattern.search(text) for pattern in patterns) for text in descriptions),
+            dtype=bool,
+            count=len(descriptions),
+        )
+
+    return Predicate(fn, f"description_contains({sorted(keywords)})")
+
+
+def game_tying():
+    """ The play left the score tied """
+    def fn(df):
+        _, after = _signed_diffs(df)
+        return after == 0
+
+    return Predicate(fn, "game_tying")
+
+
+def lead_taking():
+    """ The play gave the scoring team the lead (a lead change or breaking a tie) """
+    def fn(df):
+        before, after = _signed_diffs(df)
+        return ((before <= 0) & (after > 0)) | ((before >= 0) & (after < 0))
+
+    return Predicate(fn, "lead_taking")
+
+
+def lead_change():
+    """ The play flipped the lead from one team to the other """
+    def fn(df):
+        before, after = _signed_diffs(df)
+        return ((before < 0) & (after > 0)) | ((before > 0) & (after < 0))
+
+    return Predicate(fn, "lead_change")
+
+
+def margin_between(low=None, high=None):
+    """ The absolute score margin before the play lies within [low, high] """
+    def fn(df):
+        margin = _column(df, 'Score_Diff')
+        mask = np.ones(len(margin), dtype=bool)
+        if low is not None:
+            mask &= margin >= low
+        if high is not None:
+            mask &= margin <= high
+        return mask
+
+    return Predicate(fn, f"margin_between({low}, {high})")
+
+
+def in_periods(periods):
+    """ The play happened in one of the given periods (5+ for overtime) """
+    periods = np.asarray(list(periods))
+    return Predicate(lambda df: np.isin(_column(df, 'Period'), periods), f"in_periods({periods.tolist()})")
+
+
+def missed():
+    """ The shot did not change the score """
+    return Predicate(lambda df: _column(df, 'Point_Change') == 0, "missed")
+
+
+SCORE_SPECIFIER_PREDICATES = {
+    'GT': game_tying,
+    'LT': lead_taking,
+}
+
+
+def compile_filters(context_measure, shot_specifiers=None, score_specifiers=None, clutch_time=None):
+    """
+    Compile the entity extractor's output for a single context measure into one predicate.
+
+    Parameters:
+        context_measure (str): Context measure being fetched (e.g. 'PTS', 'MISS').
+        shot_specifiers (iterable): Canonical shot specifiers that must appear in the description.
+        score_specifiers (str): Score specifier code ('GT' or 'LT').
+        clutch_time (str): Clutch time window, if any.
+
+    Returns:
+        Predicate: Combined predicate, `ALL` if there is nothing to filter on.
+    """
+    predicate = ALL
+
+    if shot_specifiers:
+        predicate = predicate & description_contains(shot_specifiers)
+
+    if score_specifiers in SCORE_SPECIFIER_PREDICATES:
+        predicate = predicate & SCORE_SPECIFIER_PREDICATES[score_specifiers]()
+
+    if clutch_time:
+        # Clutch is defined as the last 5 minutes of a game with a score differential of 5 or fewer points
+        predicate = predicate & margin_between(high=5)
+
+    if context_measure == 'MISS':
+        predicate = predicate & missed()
+
+    return predicate
+
+
+def apply_predicate(df, predicate):
+    """
+    Select the rows of `df` matching `predicate` with a single copy.
+
+    Parameters:
+        df (pd.DataFrame): Processed plays DataFrame.
+        predicate (Predicate): Predicate to evaluate.
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    if predicate is ALL:
+        return df
+    return df[predicate(df)]
@@ -0,0 +1,202 @@
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# Classes whose methods get their own breakdown in a profile
+ENGINE_CLASSES = ("EntityExtractor", "SearchEngine")
+
+
+def _label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class StackSampler:
+    """
+    Sampling profiler for request threads.
+
+    A single background thread wakes every `interval` seconds, grabs the current stack of every
+    registered thread with `sys._current_frames()` and counts it. Threads register with `begin()`
+    and collect their stack counts with `end()`, so one sampler can serve concurrent requests.
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._threads = {}  # thread id -> Counter of stacks
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def begin(self, thread_id=None):
+        with self._lock:
+            self._threads[thread_id or threading.get_ident()] = Counter()
+
+    def end(self, thread_id=None):
+        with self._lock:
+            return self._threads.pop(thread_id or threading.get_ident(), Counter())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._threads:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._threads.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_stack(frame)] += 1
+                # Drop the frame references right away so sampled frames are not kept alive
+                del frames, frame
+
+
+class Profile:
+    """ Sampled stacks of a single request """
+    def __init__(self, label, duration_ms, interval, stacks):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.duration_ms = duration_ms
+        self.interval = interval
+        self.stacks = stacks
+        self.created_at = time.time()
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def folded(self):
+        """ Stacks in the folded format read by flamegraph.pl and speedscope """
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+    def breakdown(self, classes=None, limit=None):
+        """
+        Per-function sample counts.
+
+        Parameters:
+            classes (iterable): Only keep methods of these classes.
+            limit (int): Keep at most this many functions.
+
+        Returns:
+            list: Dicts with self/total samples and estimated milliseconds, most expensive first.
+        """
+        # The sampler thread has to win the GIL to take a sample, so on busy Python code far fewer
+        # samples land than the interval suggests. Spread the measured wall time over the samples taken.
+        ms_per_sample = self.duration_ms / self.samples if self.samples else 0.0
+
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+
+        rows = []
+        for label, total in total_counts.most_common():
+            if classes and not any(f".{cls}." in label for cls in classes):
+                continue
+            rows.append({
+                "function": label,
+                "self_samples": self_counts[label],
+                "total_samples": total,
+                "self_ms": round(self_counts[label] * ms_per_sample, 1),
+                "total_ms": round(total * ms_per_sample, 1),
+            })
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+    def to_dict(self, include_folded=True):
+        profile = {
+            "id": self.id,
+            "label": self.label,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "interval_ms": self.interval * 1000,
+            "expected_samples": int(self.duration_ms / (self.interval * 1000)) if self.interval else None,
+            "samples": self.samples,
+            "effective_interval_ms": round(self.duration_ms / self.samples, 2) if self.samples else None,
+            "engine": self.breakdown(ENGINE_CLASSES),
+            "functions": self.breakdown(limit=50),
+        }
+        if include_folded:
+            profile["folded"] = self.folded()
+        return profile
+
+    def save(self, directory):
+        """ Write `<id>.folded` and `<id>.json` to `directory` and return the JSON path """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.id}.folded"), "w") as f:
+            f.write(self.folded() + "\n")
+        path = os.path.join(directory, f"{self.id}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_dict(include_folded=False), f, indent=2)
+        return path
+
+
+class SlowestProfiles:
+    """
+    Bounded buffer holding the profiles of the slowest `size` requests of the last `window` seconds.
+    Older profiles age out, so startup outliers (cold model, cold upstream) do not stay forever.
+    """
+    def __init__(self, size=20, window=60 * 60):
+        self.size = size
+        self.window = window
+        self._heap = []  # min-heap of (duration_ms, tiebreak, profile)
+        self._tiebreak = itertools.count()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.window
+        if any(profile.created_at < cutoff for _, _, profile in self._heap):
+            self._heap = [entry for entry in self._heap if entry[2].created_at >= cutoff]
+            heapq.heapify(self._heap)
+
+    def add(self, profile):
+        entry = (profile.duration_ms, next(self._tiebreak), profile)
+        with self._lock:
+            self._evict_expired()
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif profile.duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def get(self, profile_id):
+        with self._lock:
+            self._evict_expired()
+            return next((profile for _, _, profile in self._heap if profile.id == profile_id), None)
+
+    def list(self):
+        """ Profiles from slowest to fastest """
+        with self._lock:
+            self._evict_expired()
+            return [profile for _, _, profile in sorted(self._heap, key=lambda entry: entry[0], reverse=True)]
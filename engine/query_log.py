@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from engine.cache import plan_key
+
+BUCKET_SECONDS = 60 * 60
+
+
+class QueryLog:
+    """
+    Append-only JSON lines log of served queries.
+
+    Each line is a compact record: `t` (unix time), `q` (raw query), `p` (the upstream plans the
+    query resolved to), `ms` (latency in milliseconds) and `n` (number of clips returned).
+    Plan popularity is kept in memory in hourly buckets and brought up to date by reading only the
+    lines appended since the last call, so several worker processes can share one log file. Buckets
+    older than `lookback_days` are dropped, so the ranking follows what is popular right now.
+
+    Once the file grows past `max_bytes` it is rotated to `<path>.1`, replacing the previous one.
+    """
+    def __init__(self, path, lookback_days=7, max_bytes=16 * 1024 * 1024):
+        self.path = path
+        self.lookback = lookback_days * 24 * 60 * 60
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._plans = {}  # plan key -> plan params
+        self._buckets = {}  # hour -> Counter of plan keys
+        self._offset = 0
+        self._inode = None
+        with self._lock:
+            self._load()
+
+    def _read(self, path, offset):
+        """ Count the complete lines of `path` after `offset` and return the new offset """
+        if not os.path.exists(path):
+            return offset
+        cutoff = time.time() - self.lookback
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Another process is mid-write; pick the line up next time
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("t", 0) >= cutoff:
+                    self._count(record.get("p", []), record["t"])
+        return offset
+
+    def _load(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if inode != self._inode:
+            # First read, or rotated since the last one: finish `<path>.1` before starting on the new file
+            self._finish_rotated()
+            self._inode = inode
+            self._offset = 0
+        self._offset = self._read(self.path, self._offset)
+
+    def _finish_rotated(self):
+        """ Read the rest of `<path>.1`: all of it if never seen (it holds the start of the lookback window) """
+        rotated = self.path + ".1"
+        try:
+            rotated_inode = os.stat(rotated).st_ino
+        except FileNotFoundError:
+            return
+        if self._inode is None:
+            self._read(rotated, 0)
+        elif rotated_inode == self._inode:
+            self._read(rotated, self._offset)
+        # Otherwise it was rotated more than once since the last read and the lines we missed are gone
+
+    def _count(self, plans, timestamp):
+        bucket = self._buckets.setdefault(int(timestamp // BUCKET_SECONDS), Counter())
+        for plan in plans:
+            key = plan_key(plan)
+            self._plans[key] = plan
+            bucket[key] += 1
+
+    def _expire(self):
+        oldest = int((time.time() - self.lookback) // BUCKET_SECONDS)
+        for hour in [hour for hour in self._buckets if hour < oldest]:
+            del self._buckets[hour]
+        live = set()
+        for bucket in self._buckets.values():
+            live.update(bucket)
+        for key in [key for key in self._plans if key not in live]:
+            del self._plans[key]
+
+    def _rotate(self, fd):
+        try:
+            if os.stat(self.path).st_ino != os.fstat(fd).st_ino:
+                return  # Another process already rotated it
+            os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+
+    def record(self, query, plans, latency_ms, result_size):
+        """
+        Record a served query.
+
+        Parameters:
+            query (str): The raw user query.
+            plans (list): Upstream request parameters the query resolved to.
+            latency_ms (float): End-to-end latency of the request.
+            result_size (int): Number of clips returned.
+        """
+        record = {"t": round(time.time(), 3), "q": query, "p": plans, "ms": round(latency_ms, 1), "n": result_size}
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            # A single O_APPEND write keeps lines from concurrent workers intact
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (line + "\n").encode())
+                if self.max_bytes and os.fstat(fd).st_size > self.max_bytes:
+                    self._rotate(fd)  # The next `top_plans` finishes the old file from `<path>.1`
+            finally:
+                os.close(fd)
+
+    def top_plans(self, n):
+        """ The `n` most requested plans within the lookback window, most popular first """
+        with self._lock:
+            self._load()
+            self._expire()
+            hits = Counter()
+            for bucket in self._buckets.values():
+                hits.update(bucket)
+            return [self._plans[key] for key, _ in hits.most_common(n)]
@@ -0,0 +1,185 @@
+import json
+import pandas as pd
+from engine.utils import CLIP_COLUMNS
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are optional
+    pa = None
+
+ROWS_MEDIA_TYPE = "application/json"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.ballharbor.columnar+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Columns that can be derived from the ones kept, left out of columnar responses unless asked for
+DERIVED_COLUMNS = [
+    'Year', 'Month', 'Day',  # Game_Date
+    'Point_Change', 'Score_Diff', 'Score_Diff_After',  # Home/Visitor points before and after
+    'Home_Team_ID', 'Visitor_Team_ID',  # Home_Team / Visitor_Team
+]
+COLUMNAR_COLUMNS = [column for column in CLIP_COLUMNS if column not in DERIVED_COLUMNS]
+
+# Low cardinality columns sent as indices into a shared dictionary
+DICTIONARY_COLUMNS = {'Home_Team': 'team', 'Visitor_Team': 'team'}
+
+
+# Supported media types, in order of preference when the client likes several equally
+SUPPORTED_MEDIA_TYPES = [ROWS_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE, ARROW_MEDIA_TYPE]
+
+
+def _parse_accept(accept):
+    """ Media ranges of an Accept header as (type, subtype, q) tuples """
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [piece.strip() for piece in part.split(";")]
+        if "/" not in media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type, _, subtype = media_range.lower().partition("/")
+        ranges.append((media_type, subtype, q))
+    return ranges
+
+
+def _specificity(range_type, range_subtype, supported):
+    """ How specifically a media range matches a supported type: 2 exact, 1 `type/*`, 0 `*/*`, None no match """
+    media_type, subtype = supported.split("/")
+    if (range_type, range_subtype) == (media_type, subtype):
+        return 2
+    if (range_type, range_subtype) == (media_type, "*"):
+        return 1
+    if (range_type, range_subtype) == ("*", "*"):
+        return 0
+    return None
+
+
+def negotiate(accept):
+    """
+    Pick the response media type from an Accept header, honouring q-values.
+
+    For each supported type the most specific matching media range decides its q-value; the highest
+    q wins, then the most specific match, then server preference. No header means row JSON, and
+    Arrow is only offered when pyarrow is installed.
+
+    Returns:
+        str: The chosen media type, or None when the client accepts none of the supported types.
+    """
+    if not accept or not accept.strip():
+        return ROWS_MEDIA_TYPE
+    ranges = _parse_accept(accept)
+
+    best = None
+    for preference, supported in enumerate(SUPPORTED_MEDIA_TYPES):
+        if supported == ARROW_MEDIA_TYPE and pa is None:
+            continue
+        matches = [(_specificity(range_type, range_subtype, supported), q) for range_type, range_subtype, q in ranges]
+        matches = [match for match in matches if match[0] is not None]
+        if not matches:
+            continue
+        specificity, q = max(matches)
+        if q <= 0:
+            continue
+        candidate = (q, specificity, -preference)
+        if best is None or candidate > best[0]:
+            best = (candidate, supported)
+    return best[1] if best else None
+
+
+def unknown_fields(fields):
+    return [field for field in fields or [] if field not in CLIP_COLUMNS]
+
+
+def project(df, fields, default=CLIP_COLUMNS):
+    """
+    Select `fields` (or `default` when no fields are given) from a clip DataFrame.
+    An empty result still carries the selected columns.
+    """
+    # Drop repeated names (keeping the first) so every encoder sees unique columns
+    columns = list(dict.fromkeys(fields)) if fields else list(default)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+    return df[columns]
+
+
+def _column_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d').where(series.notna(), None).tolist()
+    if series.dtype == object or series.hasnans:
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def to_columnar_json(query, df, extra=None):
+    """
+    Encode clips as columnar JSON.
+
+    Every column is a single list, and team codes are sent as indices into `dictionaries["team"]`.
+
+    Parameters:
+        query (str): The original query, echoed back.
+        df (pd.DataFrame): Projected clip DataFrame.
+        extra (dict): Additional top-level keys (e.g. a profile).
+
+    Returns:
+        bytes: UTF-8 encoded JSON document.
+    """
+    dictionaries = {}
+    columns = {}
+    encoding = {}
+
+    # Build each shared dictionary over all the columns that use it
+    for name in set(DICTIONARY_COLUMNS.values()):
+        members = [column for column, dictionary in DICTIONARY_COLUMNS.items() if dictionary == name and column in df.columns]
+        if members:
+            _, uniques = pd.factorize(pd.concat([df[column] for column in members], ignore_index=True), sort=True)
+            dictionaries[name] = uniques.tolist()
+
+    for column in df.columns:
+        dictionary = DICTIONARY_COLUMNS.get(column)
+        if dictionary in dictionaries:
+            codes = pd.Categorical(df[column], categories=dictionaries[dictionary]).codes
+            columns[column] = codes.tolist()  # -1 marks a missing value
+            encoding[column] = dictionary
+        else:
+            columns[column] = _column_values(df[column])
+
+    document = {
+        "query": query,
+        "rows": len(df),
+        "columns": columns,
+        "dictionaries": dictionaries,
+        "encoding": encoding,
+    }
+    if extra:
+        document.update(extra)
+    return json.dumps(document, separators=(",", ":"), default=str).encode()
+
+
+def to_arrow_ipc(query, df):
+    """
+    Encode clips as an Arrow IPC stream with team codes dictionary-encoded.
+    The query is stored in the schema metadata.
+
+    Returns:
+        bytes: The IPC stream.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for column in DICTIONARY_COLUMNS:
+        if column in table.column_names:
+            index = table.column_names.index(column)
+            table = table.set_column(index, column, table.column(index).dictionary_encode())
+    table = table.replace_schema_metadata({"query": query})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -3,9 +3,10 @@ from nba_api.stats.endpoints import commonplayerinfo, videodetailsasset
 import pandas as pd
 from engine.utils import load_team_id_dict, create_player_dictionaries, create_matchers, process_videos
 from engine.entity_extractor import EntityExtractor
-import re
+from engine.cache import TTLCache, SqliteTTLCache, plan_key
+from engine.predicates import compile_filters, apply_predicate, description_contains, SCORE_SPECIFIER_PREDICATES
 class SearchEngine:
-    def __init__(self, season='2023-24', season_type='Regular Season', last_n_games=200):
+    def __init__(self, season='2023-24', season_type='Regular Season', last_n_games=200, cache_ttl=6 * 60 * 60, cache_path=None):
         self.nlp = spacy.load("en_core_web_sm")
         self.team_id_dict = load_team_id_dict("engine/team_id_dict.json")
         self.active_players, first_name_to_full_name, last_name_to_full_name = create_player_dictionaries()
@@ -23,6 +24,13 @@ class SearchEngine:
             "month": 0,
         }
 
+        # Raw VideoDetailsAsset responses keyed by their normalized request parameters.
+        # With a cache_path the cache lives in a SQLite file shared by every worker process.
+        if cache_path:
+            self.video_cache = SqliteTTLCache(cache_path, ttl=cache_ttl)
+        else:
+            self.video_cache = TTLCache(ttl=cache_ttl)
+
     def set_parameter(self, param_name, value):
         self.params[param_name] = value
 
@@ -47,12 +55,7 @@ class SearchEngine:
         if not keywords:
             return df  
 
-        filtered_df = df
-        for keyword in keywords:
-            pattern = rf'\b{re.escape(keyword)}\b' 
-            filtered_df = filtered_df[filtered_df['Description'].str.contains(pattern, case=False, na=False, regex=True)]
-
-        return filtered_df
+        return apply_predicate(df, description_contains(keywords))
     
     def build_interpretation_message(self, params, play_type_keywords):
         message_parts = []
@@ -130,30 +133,49 @@ class SearchEngine:
             return context_measure.lower()
         
     def filter_with_score_specifiers(self, df, score_specifiers):
-        df['Score_Diff_Before'] = df['Home_Points_Before'] - df['Visitor_Points_Before']
-        df['Score_Diff_After'] = df['Home_Points_After'] - df['Visitor_Points_After']
+        """
+        Filter plays on a score specifier ('GT' for game-tying, 'LT' for lead-taking).
+        The input DataFrame is left untouched.
+        """
+        if score_specifiers not in SCORE_SPECIFIER_PREDICATES:
+            return df
 
-        # GT: Check if the shot tied the game
-        if score_specifiers == 'GT':
-            df = df[df['Score_Diff_After'] == 0]
-        
-        # LT: Check if the shot was a lead-taking shot
-        elif score_specifiers == 'LT':
-            df = df[((df['Score_Diff_Before'] <= 0) & (df['Score_Diff_After'] > 0)) |
-                    ((df['Score_Diff_Before'] >= 0) & (df['Score_Diff_After'] < 0))]
+        return apply_predicate(df, SCORE_SPECIFIER_PREDICATES[score_specifiers]())
+
+    def fetch_video_details(self, params, refresh=False):
+        """
+        Fetch the raw VideoDetailsAsset response for `params`, served from the cache when possible.
+
+        Parameters:
+            params (dict): Upstream request parameters.
+            refresh (bool): Bypass the cache and re-fetch (used by the cache warmer).
+
+        Returns:
+            dict: The response dictionary.
+        """
+        key = plan_key(params)
+        if not refresh:
+            video_dict = self.video_cache.get(key)
+            if video_dict is not None:
+                return video_dict
 
-        return df
-    def fetch_videos(self, context_measure, shot_specifiers=None, score_specifiers=None):
+        video_dict = videodetailsasset.VideoDetailsAsset(**params).get_dict()
+        self.video_cache.set(key, video_dict)
+        return video_dict
+
+    def fetch_videos(self, context_measure, shot_specifiers=None, score_specifiers=None, plans=None):
         try:
             self.set_parameter("context_measure_detailed", context_measure)
-            params = self.build_params()
+            params = dict(self.build_params())
             intepretation = self.build_interpretation_message(params, shot_specifiers)
             print(intepretation)
             if params['context_measure_detailed'] == 'MISS':
                 params['context_measure_detailed'] = 'FGA'
-            
-            response = videodetailsasset.VideoDetailsAsset(**params)
-            video_dict = response.get_dict()
+
+            if plans is not None:
+                plans.append(params)
+
+            video_dict = self.fetch_video_details(params)
             videos = video_dict['resultSets']
             video_urls = videos['Meta']['videoUrls']
             plays = videos['playlist']
@@ -169,18 +191,9 @@ class SearchEngine:
 
             df = process_videos(df)  # Processing layer
 
-            if shot_specifiers:
-                df = self.filter_play_descriptions(df, shot_specifiers)
-            
-            if score_specifiers:
-                df = self.filter_with_score_specifiers(df, score_specifiers)
-            
-            if params['clutch_time_nullable']:
-                # Clutch is defined as the last 5 minutes of a game with a score differential of 5 or fewer points
-                df = df[df['Score_Diff'] <= 5]
-            
-            if context_measure == 'MISS':
-                df = df[df['Point_Change'] == 0]
+            # Evaluate every filter as one boolean mask and copy the matching rows once
+            predicate = compile_filters(context_measure, shot_specifiers, score_specifiers, params['clutch_time_nullable'])
+            df = apply_predicate(df, predicate)
 
             return df
         except Exception as e:
@@ -210,6 +223,17 @@ class SearchEngine:
             return None, None, None
 
     def query(self, query):
+        videos, _ = self.query_with_plans(query)
+        return videos
+
+    def query_with_plans(self, query):
+        """
+        Run a query and also return the upstream request parameters (plans) it resolved to.
+
+        Returns:
+            tuple: (pd.DataFrame of clips, list of plan dicts)
+        """
+        plans = []
         player_name, team_name, season_type, context_measures, month, clutch_time, shot_specifiers, score_specifiers = self.entity_extractor.extract_entities(query)
         print(f"EXTRACTED: Player Name={player_name}, Team Name={team_name}, Season Type={season_type}, Context Measures={context_measures}, Month={month}, Clutch Time={clutch_time}, Shot Specifiers={shot_specifiers}, Score Specifier={score_specifiers}") 
         
@@ -223,7 +247,7 @@ class SearchEngine:
         player_id, team_id, opponent_team_id = self.map_player_team_ids(player_name, team_name)
         if player_id is None or team_id is None:
             print(f"Could not retrieve valid player or team ID for query: {query}")
-            return pd.DataFrame()
+            return pd.DataFrame(), plans
 
         self.set_parameter("player_id", player_id)
         self.set_parameter("team_id", team_id)
@@ -241,9 +265,9 @@ class SearchEngine:
         for measure in context_measures:
             vids = None
             if measure == "PTS" or measure == "FGA" or measure == "MISS":
-                vids = self.fetch_videos(measure, shot_specifiers, score_specifiers)
+                vids = self.fetch_videos(measure, shot_specifiers, score_specifiers, plans=plans)
             else: 
-                vids = self.fetch_videos(measure)
+                vids = self.fetch_videos(measure, plans=plans)
             videos = pd.concat([videos, vids])
 
-        return videos
\ No newline at end of file
+        return videos, plans
\ No newline at end of file
@@ -50,6 +50,14 @@ def preprocess_query(query):
     return " ".join(filtered_tokens)
 
 
+# Columns of a processed clip DataFrame, in a logical order for readability
+CLIP_COLUMNS = [
+    'Game_ID', 'Game_Date', 'Year', 'Month', 'Day', 'Game_Code', 'Period', 
+    'Home_Team', 'Visitor_Team', 'Description', 'Home_Points_Before', 'Home_Points_After',
+    'Visitor_Points_Before', 'Visitor_Points_After', 'Point_Change', 'Score_Diff', 'Score_Diff_After',
+    'Home_Team_ID', 'Visitor_Team_ID', 'Video_Link', 'Thumbnail_Link', 
+]
+
 def process_videos(df):
     """
     Reformat NBA video DataFrame rows into more readable columns and extract video URLs and thumbnails.
@@ -100,11 +108,6 @@ def process_videos(df):
     formatted_df['Thumbnail_Link'] = formatted_df['Video_URL'].apply(lambda x: x.get('lth') if isinstance(x, dict) else None)
 
     # Reorder columns to a more logical structure for readability
-    formatted_df = formatted_df[[
-        'Game_ID', 'Game_Date', 'Year', 'Month', 'Day', 'Game_Code', 'Period', 
-        'Home_Team', 'Visitor_Team', 'Description', 'Home_Points_Before', 'Home_Points_After',
-        'Visitor_Points_Before', 'Visitor_Points_After', 'Point_Change', 'Score_Diff', 'Score_Diff_After',
-        'Home_Team_ID', 'Visitor_Team_ID', 'Video_Link', 'Thumbnail_Link', 
-    ]]
+    formatted_df = formatted_df[CLIP_COLUMNS]
 
     return formatted_df
\ No newline at end of file
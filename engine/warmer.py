@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from engine.cache import plan_key
+
+
+class RateLimiter:
+    """ Spaces out calls so that at most `rate` of them start per second across all threads """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+        if delay:
+            time.sleep(delay)
+
+
+class CacheWarmer:
+    """
+    Background scheduler that re-fetches the most popular upstream plans from the query log.
+
+    Warming runs once a day after `nightly_hour` (local time, once the night's games are final) and
+    whenever a popular plan's cache entry is within `refresh_margin` seconds (at most a quarter of
+    the cache TTL) of expiring. At most `max_workers` warm requests are in flight and at most `rate`
+    start per second, so live traffic always has upstream headroom.
+    """
+    def __init__(self, search_engine, query_log, top_n=25, max_workers=2, rate=1.0,
+                 nightly_hour=4, refresh_margin=10 * 60, poll_interval=60):
+        self.search_engine = search_engine
+        self.query_log = query_log
+        self.top_n = top_n
+        self.max_workers = max_workers
+        self.nightly_hour = nightly_hour
+        self.refresh_margin = refresh_margin
+        self.poll_interval = poll_interval
+        self.rate_limiter = RateLimiter(rate)
+        self._last_nightly = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        now = datetime.now()
+        if now.hour >= self.nightly_hour:
+            # Started after tonight's window (a deploy or restart): wait for the hour to come round again
+            self._last_nightly = now.date()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Cache warming failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def tick(self, now=None):
+        """
+        Warm whatever is due at `now`.
+
+        Returns:
+            int: Number of plans warmed.
+        """
+        if self.search_engine.video_cache.ttl <= 0:
+            return 0  # Caching is disabled, warming would only add upstream load
+
+        now = now or datetime.now()
+        top_plans = self.query_log.top_plans(self.top_n)
+
+        if now.hour >= self.nightly_hour and self._last_nightly != now.date():
+            self._last_nightly = now.date()
+            due = top_plans
+        else:
+            expiring = set(self.search_engine.video_cache.expiring_within(self.effective_refresh_margin()))
+            due = [plan for plan in top_plans if plan_key(plan) in expiring]
+
+        return self.warm(due)
+
+    def effective_refresh_margin(self):
+        """
+        The refresh margin, capped at a quarter of the cache TTL. Otherwise a TTL at or below the
+        margin would leave every popular entry permanently "expiring" and re-fetched on every poll.
+        """
+        return min(self.refresh_margin, self.search_engine.video_cache.ttl / 4)
+
+    def warm(self, plans):
+        if not plans:
+            return 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return sum(executor.map(self._warm_one, plans))
+
+    def _warm_one(self, plan):
+        if self._stop.is_set():
+            return 0
+        self.rate_limiter.wait()
+        try:
+            self.search_engine.fetch_video_details(plan, refresh=True)
+            return 1
+        except Exception as e:
+            print(f"Could not warm plan {plan_key(plan)}: {e}")
+            return 0
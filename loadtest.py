@@ -0,0 +1,292 @@
+"""
+Offline load test for the search API.
+
+Starts the local stats.nba.com stand-in (`stats_standin.py`) and the preforked server (`serve.py`)
+pointed at it, replays a query corpus against `/query` at one or more concurrency levels, and
+prints a JSON report with throughput, latency percentiles, error rate and per-worker memory so
+runs can be diffed across commits.
+
+Usage:
+    python loadtest.py --workers 2 --concurrency 1,4,16 --duration 30 --output before.json
+    python loadtest.py --corpus query_log.jsonl --upstream-latency-ms 150
+    python loadtest.py --url http://127.0.0.1:8000   # against an already running server (no memory stats)
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from serve import memory_usage
+from stats_standin import start_standin
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_QUERIES = [
+    "Lebron James driving layups",
+    "Wembanyama fadeaways",
+    "Dejounte Murray floaters",
+    "Steph Curry threes against the lakers",
+    "Luka Doncic step back jumpers in the clutch",
+    "Jayson Tatum go-ahead shots",
+    "Anthony Edwards dunks in march",
+    "Nikola Jokic assists in the playoffs",
+    "Giannis Antetokounmpo blocks",
+    "Shai Gilgeous-Alexander missed pullups",
+    "Kevin Durant game tying shots",
+    "Lebrn Jmes dunkss",
+]
+
+
+def load_corpus(paths):
+    """
+    Build the list of queries to replay. Query logs (`.jsonl`) contribute their `q` field, so popular
+    queries keep their real weight; any other file is read as one query per line.
+    """
+    if not paths:
+        return list(DEFAULT_QUERIES)
+
+    queries = []
+    for path in paths:
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if path.endswith(".jsonl"):
+                    try:
+                        line = json.loads(line).get("q", "")
+                    except json.JSONDecodeError:
+                        continue
+                if line:
+                    queries.append(line)
+    return queries
+
+
+def percentile(sorted_values, p):
+    """ Nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def worker_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_report(pid):
+    if pid is None:
+        return []
+    report = []
+    for role, worker_pid in [("parent", pid)] + [("worker", child) for child in worker_pids(pid)]:
+        try:
+            usage = memory_usage(worker_pid)
+        except OSError:
+            continue
+        report.append({"pid": worker_pid, "role": role, "rss_kib": usage["rss"], "pss_kib": usage["pss"], "uss_kib": usage["uss"]})
+    return report
+
+
+def start_server(args, stats_url, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        BALLHARBOR_STATS_BASE_URL=stats_url,
+        BALLHARBOR_WARM_CACHE="0",
+        BALLHARBOR_QUERY_LOG=os.path.join(workdir, "query_log.jsonl"),
+        BALLHARBOR_CACHE_TTL=str(args.cache_ttl),
+    )
+    command = [
+        sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers),
+        "--cache-path", os.path.join(workdir, "video_cache.sqlite3"), "--log-level", "warning",
+    ]
+    if not args.preload:
+        command.append("--no-preload")
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        try:
+            requests.get(url + "/", timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not start in time")
+
+
+def run_level(url, queries, concurrency, duration, timeout):
+    """
+    Replay `queries` in order, round robin, from `concurrency` clients for `duration` seconds.
+
+    Returns:
+        tuple: (list of (latency_ms, error or None), elapsed seconds)
+    """
+    counter = itertools.count()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        samples = []
+        while time.monotonic() < deadline:
+            query = queries[next(counter) % len(queries)]
+            start = time.perf_counter()
+            try:
+                response = session.post(url + "/query", json={"query": query}, timeout=timeout)
+                if response.status_code != 200:
+                    error = f"http_{response.status_code}"
+                elif "error" in response.json():
+                    error = "app_error"
+                else:
+                    error = None
+            except (requests.RequestException, ValueError) as e:
+                error = type(e).__name__
+            samples.append(((time.perf_counter() - start) * 1000, error))
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(client) for _ in range(concurrency)]
+        samples = [sample for future in futures for sample in future.result()]
+    return samples, time.perf_counter() - start
+
+
+def summarize(concurrency, samples, elapsed, memory):
+    latencies = sorted(latency for latency, error in samples if error is None)
+    errors = {}
+    for _, error in samples:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    total = len(samples)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "errors": errors,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "memory": memory,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a query corpus against the search API and report throughput and latency.")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--corpus", action="append", help="Query corpus: a query log (.jsonl) or one query per line. Repeatable")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma separated concurrency levels to sweep")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run each concurrency level")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of unrecorded load before each level")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", help="Start the server with serve.py --no-preload")
+    parser.add_argument("--cache-ttl", type=int, default=0, help="Upstream cache TTL for the server (0 sends every request upstream)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0, help="Artificial latency of the stats stand-in")
+    parser.add_argument("--upstream-plays", type=int, default=200, help="Plays per videodetailsasset response from the stand-in")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    queries = load_corpus(args.corpus)
+    if not queries:
+        parser.error("the query corpus is empty")
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    standin = None
+    process = None
+    workdir = tempfile.TemporaryDirectory(prefix="ballharbor-loadtest-")
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            standin, stats_url = start_standin(latency_ms=args.upstream_latency_ms, plays_per_request=args.upstream_plays)
+            process, url = start_server(args, stats_url, workdir.name)
+
+        runs = []
+        for concurrency in levels:
+            if args.warmup:
+                run_level(url, queries, concurrency, args.warmup, args.timeout)
+            samples, elapsed = run_level(url, queries, concurrency, args.duration, args.timeout)
+            run = summarize(concurrency, samples, elapsed, memory_report(process.pid if process else None))
+            runs.append(run)
+            print(
+                f"concurrency={concurrency:<4} rps={run['throughput_rps']:<8} p50={run['latency_ms']['p50']} "
+                f"p95={run['latency_ms']['p95']} p99={run['latency_ms']['p99']} errors={run['error_rate']:.2%}",
+                file=sys.stderr,
+            )
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if standin is not None:
+            standin.shutdown()
+        workdir.cleanup()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "url": args.url,
+            "workers": None if args.url else args.workers,
+            "preload": args.preload,
+            "cache_ttl": args.cache_ttl,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "upstream_plays": args.upstream_plays,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "corpus": args.corpus or "default",
+            "corpus_size": len(queries),
+        },
+        "runs": runs,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
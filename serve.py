@@ -0,0 +1,213 @@
+"""
+Production entry point that loads the search engine once and forks workers from it.
+
+The parent imports `api` (spaCy model, player dictionaries, PhraseMatchers), freezes the heap with
+`gc.freeze()` so the garbage collector never touches those objects again, then forks the workers.
+Read-only structures stay shared copy-on-write between every worker. The upstream response cache
+is moved into a SQLite file (`BALLHARBOR_CACHE_PATH`) so it is shared too, and only the first worker
+runs the cache warmer.
+
+A worker that exits while the server is running is replaced, with a growing delay while it keeps
+dying right after starting.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 4 --measure                # per-worker memory with a shared, preloaded engine
+    python serve.py --workers 4 --measure --no-preload   # same, with each worker loading its own engine
+"""
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+# A worker that dies within RESTART_STABLE_SECONDS of starting is restarted after a delay that
+# doubles each time, from RESTART_BACKOFF_MIN up to RESTART_BACKOFF_MAX seconds
+RESTART_STABLE_SECONDS = 30
+RESTART_BACKOFF_MIN = 1
+RESTART_BACKOFF_MAX = 60
+
+
+def memory_usage(pid):
+    """
+    Memory usage of a process in KiB, read from /proc/<pid>/smaps_rollup (Linux only).
+
+    RSS counts shared pages in full for every process, PSS splits them between the processes
+    sharing them, and USS only counts the pages private to this process.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def print_memory_report(pids):
+    print(f"{'pid':>8} {'rss_mib':>10} {'pss_mib':>10} {'uss_mib':>10}")
+    totals = {"rss": 0, "pss": 0, "uss": 0}
+    for pid in pids:
+        usage = memory_usage(pid)
+        for key in totals:
+            totals[key] += usage[key]
+        print(f"{pid:>8} {usage['rss'] / 1024:>10.1f} {usage['pss'] / 1024:>10.1f} {usage['uss'] / 1024:>10.1f}")
+    print(f"{'total':>8} {totals['rss'] / 1024:>10.1f} {totals['pss'] / 1024:>10.1f} {totals['uss'] / 1024:>10.1f}")
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(index, sock, ready_fd, log_level):
+    # Only the first worker warms the cache; the rest just serve
+    if index > 0:
+        os.environ["BALLHARBOR_WARM_CACHE"] = "0"
+
+    try:
+        import uvicorn
+        from api import app  # Already loaded in the parent unless --no-preload
+    except BaseException:
+        # Tell the parent straight away instead of leaving it waiting for a ready byte
+        os.write(ready_fd, b"!")
+        raise
+
+    gc.enable()
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def spawn_worker(index, sock, ready_fd, log_level):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(index, sock, ready_fd, log_level)
+        except Exception as e:
+            print(f"Worker {index} failed: {e}", file=sys.stderr)
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the NBA Search Engine API from preforked workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--cache-path", default=os.environ.get("BALLHARBOR_CACHE_PATH", "video_cache.sqlite3"),
+                        help="SQLite file holding the upstream response cache shared by all workers")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="Load the engine in every worker instead of once in the parent (baseline for --measure)")
+    parser.add_argument("--measure", action="store_true",
+                        help="Print per-worker memory once every worker has loaded, then shut down")
+    args = parser.parse_args()
+
+    os.environ["BALLHARBOR_CACHE_PATH"] = args.cache_path
+
+    if args.preload:
+        # Keep the collector from rewriting object headers (and so dirtying shared pages) while loading
+        gc.disable()
+        import api  # noqa: F401  Loads SearchEngine once
+        gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    ready_r, ready_w = os.pipe()
+
+    workers = {}
+    started = {}  # worker index -> time it was last spawned
+    stopping = False
+    for index in range(args.workers):
+        workers[spawn_worker(index, sock, ready_w, args.log_level)] = index
+        started[index] = time.monotonic()
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # Wait until every worker has the app loaded. A worker killed before it could report writes
+    # nothing, so also reap children while waiting rather than blocking on the pipe.
+    ready = b""
+    failed = False
+    while len(ready) < args.workers and not failed and not stopping:
+        readable, _, _ = select.select([ready_r], [], [], 0.5)
+        if readable:
+            ready += os.read(ready_r, args.workers - len(ready))
+            failed = b"!" in ready
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid in workers:
+            workers.pop(pid)
+            failed = True
+
+    if failed:
+        print("A worker failed to load the app, shutting down", file=sys.stderr)
+        shutdown(None, None)
+    elif not stopping:
+        print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers (preload={args.preload})")
+
+    if args.measure and not stopping:
+        time.sleep(2)  # Let the servers finish starting up
+        print_memory_report([os.getpid()] + list(workers))
+        shutdown(None, None)
+
+    # Replace workers that exit on their own (a crash, or a SIGTERM sent to that worker alone),
+    # backing off while a worker keeps dying soon after it started
+    backoff = {index: 0.0 for index in range(args.workers)}
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+
+        if time.monotonic() - started[index] < RESTART_STABLE_SECONDS:
+            backoff[index] = min(max(backoff[index] * 2, RESTART_BACKOFF_MIN), RESTART_BACKOFF_MAX)
+        else:
+            backoff[index] = 0.0
+        print(f"Worker {index} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, "
+              f"restarting in {backoff[index]:.0f}s", file=sys.stderr)
+        deadline = time.monotonic() + backoff[index]
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.1)  # Short naps so a shutdown signal is not held up by the backoff
+        if stopping:
+            continue
+        started[index] = time.monotonic()
+        workers[spawn_worker(index, sock, ready_w, args.log_level)] = index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Local stand-in for the stats.nba.com endpoints the search engine calls (`commonplayerinfo` and
+`videodetailsasset`), for load testing without touching the real API.
+
+Responses mirror the shape of the real ones and are generated deterministically from the request
+parameters, with an optional artificial latency to imitate the upstream round trip.
+
+Usage:
+    python stats_standin.py --port 8100 --latency-ms 150
+    BALLHARBOR_STATS_BASE_URL="http://127.0.0.1:8100/stats/{endpoint}" uvicorn api:app
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+COMMON_PLAYER_INFO_HEADERS = [
+    "PERSON_ID", "FIRST_NAME", "LAST_NAME", "DISPLAY_FIRST_LAST", "DISPLAY_LAST_COMMA_FIRST", "DISPLAY_FI_LAST",
+    "PLAYER_SLUG", "BIRTHDATE", "SCHOOL", "COUNTRY", "LAST_AFFILIATION", "HEIGHT", "WEIGHT", "SEASON_EXP", "JERSEY",
+    "POSITION", "ROSTERSTATUS", "GAMES_PLAYED_CURRENT_SEASON_FLAG", "TEAM_ID", "TEAM_NAME", "TEAM_ABBREVIATION",
+    "TEAM_CODE", "TEAM_CITY", "PLAYERCODE", "FROM_YEAR", "TO_YEAR", "DLEAGUE_FLAG", "NBA_FLAG", "GAMES_PLAYED_FLAG",
+    "DRAFT_YEAR", "DRAFT_ROUND", "DRAFT_NUMBER", "GREATEST_75_FLAG",
+]
+
+PLAY_DESCRIPTIONS = [
+    "Driving Layup Shot", "Driving Finger Roll Layup Shot", "Running Layup Shot", "Cutting Dunk Shot",
+    "Driving Dunk Shot", "Alley Oop Dunk Shot", "Putback Layup Shot", "Tip Layup Shot", "Jump Shot",
+    "Pullup Jump Shot", "Step Back Jump Shot", "Fadeaway Jump Shot", "Turnaround Fadeaway Shot",
+    "Floating Jump Shot", "Hook Shot", "Turnaround Hook Shot", "Jump Bank Shot", "Reverse Layup Shot",
+    "3PT Jump Shot", "3PT Step Back Jump Shot", "3PT Pullup Jump Shot", "3PT Running Pull-Up Jump Shot",
+]
+
+
+def _team_ids():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine", "team_id_dict.json"), "r") as f:
+        team_id_dict = json.load(f)
+    # Keep one abbreviation per team
+    return {team_id: name for name, team_id in team_id_dict.items() if len(name) == 3}
+
+
+TEAMS = _team_ids()
+
+
+def _rng(params):
+    return random.Random(json.dumps(params, sort_keys=True))
+
+
+def common_player_info(params):
+    rng = _rng({"PlayerID": params.get("PlayerID")})
+    team_id = rng.choice(sorted(TEAMS))
+    row = [None] * len(COMMON_PLAYER_INFO_HEADERS)
+    row[0] = int(params.get("PlayerID") or 0)
+    row[COMMON_PLAYER_INFO_HEADERS.index("TEAM_ID")] = team_id
+    row[COMMON_PLAYER_INFO_HEADERS.index("TEAM_ABBREVIATION")] = TEAMS[team_id]
+    return {
+        "resource": "commonplayerinfo",
+        "parameters": params,
+        "resultSets": [
+            {"name": "CommonPlayerInfo", "headers": COMMON_PLAYER_INFO_HEADERS, "rowSet": [row]},
+            {"name": "PlayerHeadlineStats", "headers": ["PLAYER_ID", "PLAYER_NAME", "TimeFrame", "PTS", "AST", "REB", "PIE"], "rowSet": []},
+            {"name": "AvailableSeasons", "headers": ["SEASON_ID"], "rowSet": []},
+        ],
+    }
+
+
+def video_details_asset(params, plays_per_request):
+    rng = _rng(params)
+    team_id = int(params.get("TeamID") or rng.choice(sorted(TEAMS)))
+    team = TEAMS.get(team_id, "ATL")
+    playlist = []
+    video_urls = []
+    for ei in range(plays_per_request):
+        opponent_id = rng.choice([t for t in TEAMS if t != team_id])
+        home = rng.random() < 0.5
+        hpb, vpb = rng.randint(0, 130), rng.randint(0, 130)
+        points = rng.choice([0, 0, 2, 2, 2, 3])
+        hpa, vpa = (hpb + points, vpb) if home else (hpb, vpb + points)
+        description = rng.choice(PLAY_DESCRIPTIONS)
+        game_id = f"00223{rng.randint(0, 1229):05d}"
+        playlist.append({
+            "gi": game_id, "ei": ei, "y": 2024, "m": rng.randint(1, 4), "d": rng.randint(1, 28),
+            "gc": f"2024/{team}{TEAMS[opponent_id]}", "p": rng.randint(1, 4),
+            "dsc": f"Player {'MISS ' if not points else ''}{description}",
+            "ha": team if home else TEAMS[opponent_id], "hid": team_id if home else opponent_id,
+            "va": TEAMS[opponent_id] if home else team, "vid": opponent_id if home else team_id,
+            "hpb": hpb, "hpa": hpa, "vpb": vpb, "vpa": vpa, "pta": 0,
+        })
+        uuid = f"{game_id}-{ei}"
+        video_urls.append({
+            "uuid": uuid,
+            "lurl": f"https://videos.example.invalid/{uuid}_1280x720.mp4",
+            "lth": f"https://videos.example.invalid/{uuid}_1280x720.jpg",
+        })
+    return {
+        "resource": "videodetailsasset",
+        "parameters": params,
+        "resultSets": {"Meta": {"videoUrls": video_urls}, "playlist": playlist},
+    }
+
+
+def make_handler(latency_ms, plays_per_request):
+    class StatsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1].lower()
+
+            if endpoint == "commonplayerinfo":
+                body = common_player_info(params)
+            elif endpoint == "videodetailsasset":
+                body = video_details_asset(params, plays_per_request)
+            else:
+                self.send_error(404, f"Unknown endpoint: {endpoint}")
+                return
+
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StatsHandler
+
+
+def start_standin(host="127.0.0.1", port=0, latency_ms=0, plays_per_request=200):
+    """
+    Start the stand-in server on a background thread.
+
+    Returns:
+        tuple: (server, base URL template to use as `BALLHARBOR_STATS_BASE_URL`)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(latency_ms, plays_per_request))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stats-standin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/stats/{{endpoint}}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for stats.nba.com.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--plays", type=int, default=200, help="Plays returned per videodetailsasset request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency_ms, args.plays))
+    print(f"Stats stand-in on http://{args.host}:{args.port}/stats/{{endpoint}}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()